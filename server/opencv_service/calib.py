@@ -0,0 +1,99 @@
+"""
+Calibration set builder for INT8 YOLO export
+
+Samples frames from a parking lot video and writes them together with a
+dataset YAML that Ultralytics uses to calibrate INT8 quantization.
+
+Usage: python calib.py <video_path> [num_frames] [output_dir]
+
+Then export with:
+    python yolo_detector.py --export engine --int8 --data calib/calib.yaml
+"""
+import os
+import sys
+import cv2
+
+
+def build_calibration_set(video_path: str, num_frames: int = 200,
+                          output_dir: str = "calib",
+                          model_path: str = "models/yolo11s.pt") -> str:
+    """
+    Extract evenly spaced frames from a video for INT8 calibration
+    
+    Args:
+        video_path: Path to parking lot video
+        num_frames: Number of frames to sample
+        output_dir: Directory to write images and dataset YAML to
+        model_path: YOLO weights whose class names go into the YAML
+        
+    Returns:
+        Path to the written dataset YAML
+    """
+    if not os.path.exists(video_path):
+        raise ValueError(f"Video file not found: {video_path}")
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames == 0:
+        cap.release()
+        raise ValueError(f"Video file has no frames: {video_path}")
+    
+    step = max(1, total_frames // num_frames)
+    image_dir = os.path.join(output_dir, "images")
+    os.makedirs(image_dir, exist_ok=True)
+    
+    # Read sequentially and skip with grab() instead of seeking per sample
+    saved = 0
+    index = 0
+    while saved < num_frames and cap.grab():
+        if index % step == 0:
+            ret, frame = cap.retrieve()
+            if ret and frame is not None:
+                cv2.imwrite(os.path.join(image_dir, f"{saved:04d}.jpg"), frame)
+                saved += 1
+        index += 1
+    cap.release()
+    
+    if saved == 0:
+        raise ValueError(f"Could not extract frames from {video_path}")
+    
+    # Calibration labels are not needed, but the YAML must list the model's classes
+    from ultralytics import YOLO
+    names = YOLO(model_path).names
+    
+    yaml_path = os.path.join(output_dir, "calib.yaml")
+    with open(yaml_path, "w") as f:
+        f.write(f"path: {os.path.abspath(output_dir)}\n")
+        f.write("train: images\n")
+        f.write("val: images\n")
+        f.write("names:\n")
+        for idx, name in names.items():
+            f.write(f"  {idx}: {name}\n")
+    
+    print(f"Saved {saved} calibration frames to {image_dir}")
+    return yaml_path
+
+
+def main():
+    """Main entry point for command-line usage"""
+    if len(sys.argv) < 2:
+        print("Usage: python calib.py <video_path> [num_frames] [output_dir]")
+        sys.exit(1)
+    
+    video_path = sys.argv[1]
+    num_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else "calib"
+    
+    try:
+        yaml_path = build_calibration_set(video_path, num_frames, output_dir)
+        print(f"Wrote dataset config to {yaml_path}")
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
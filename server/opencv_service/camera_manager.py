@@ -6,11 +6,264 @@ import cv2
 import numpy as np
 from typing import List, Dict, Any, Optional
 import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class FrameGrabber:
+    """
+    Keeps a capture source open and reads it continuously in a background thread.
+    
+    For local cameras the thread only grabs frames, which pulls them off the
+    device without decoding, so the driver buffer never fills with stale
+    frames; the latest frame is decoded on demand in read(). For network
+    streams decoding is the expensive part, so the thread decodes every frame
+    itself and keeps only the newest one, and read() just hands it over.
+    
+    When the source ends or drops, read() returns None instead of the last
+    good frame, so callers notice and reopen it. The capture is released by
+    the read thread itself when it exits, so it is never released while a
+    grab or read is still in progress.
+    """
+    
+    def __init__(self, source: Any, api_preference: int = cv2.CAP_ANY,
+                 decode_in_background: bool = False, stale_after: float = 5.0,
+                 max_failed_reads: int = 50, idle_timeout: Optional[float] = None):
+        """
+        Initialize frame grabber
+        
+        Args:
+            source: Camera index, stream URL or GStreamer pipeline to open
+            api_preference: OpenCV capture backend (e.g. cv2.CAP_GSTREAMER)
+            decode_in_background: Decode frames in the grab thread
+            stale_after: Seconds without a new frame after which read()
+                reports the source as lost
+            max_failed_reads: Consecutive failed reads after which the source
+                is considered ended and the read loop stops
+            idle_timeout: Seconds without a read() call after which the read
+                loop stops and releases the source (None keeps it open)
+        """
+        self.source = source
+        self.decode_in_background = decode_in_background
+        self.stale_after = stale_after
+        self.max_failed_reads = max_failed_reads
+        self.idle_timeout = idle_timeout
+        self.cap = cv2.VideoCapture(source, api_preference)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce latency
+        self._lock = threading.Lock()
+        self._latest = None
+        self._latest_time = 0.0  # time.monotonic() of the last good read
+        self._last_used = time.monotonic()  # time.monotonic() of the last read() call
+        self._running = False
+        self._thread = None
+    
+    def start(self) -> bool:
+        """
+        Start reading frames in the background
+        
+        Returns:
+            True if the source is open and delivered a first frame
+        """
+        if not self.cap.isOpened():
+            return False
+        
+        if self.decode_in_background:
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                return False
+            self._latest = frame
+        elif not self.cap.grab():
+            return False
+        self._latest_time = self._last_used = time.monotonic()
+        
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+    
+    @property
+    def running(self) -> bool:
+        """True while the read loop is running and the source is open"""
+        return self._running
+    
+    def _run(self):
+        """Read loop, drops every frame that is not consumed in time"""
+        try:
+            self._read_loop()
+        finally:
+            # Release before clearing _running, so a grabber reopened for the
+            # same camera never overlaps with this handle
+            with self._lock:
+                self.cap.release()
+                self._running = False
+                self._latest = None
+    
+    def _read_loop(self):
+        """Keep reading until stopped, the source ends or nobody reads any more"""
+        failed_reads = 0
+        while self._running:
+            if (self.idle_timeout is not None
+                    and time.monotonic() - self._last_used > self.idle_timeout):
+                break
+            
+            if self.decode_in_background:
+                # OpenCV releases the GIL while decoding, so this overlaps
+                # with detection running on the request thread
+                ok, frame = self.cap.read()
+                ok = ok and frame is not None
+                if ok:
+                    with self._lock:
+                        self._latest = frame
+                        self._latest_time = time.monotonic()
+            else:
+                with self._lock:
+                    ok = self.cap.grab()
+                    if ok:
+                        self._latest_time = time.monotonic()
+            
+            if ok:
+                failed_reads = 0
+                continue
+            
+            failed_reads += 1
+            if failed_reads >= self.max_failed_reads:
+                # Source ended or dropped: stop serving the last good frame
+                break
+            time.sleep(0.01)
+    
+    def read(self) -> Optional[np.ndarray]:
+        """
+        Return the most recent frame
+        
+        Returns:
+            Latest frame as numpy array, or None if failed or if the source
+            has not delivered a frame for stale_after seconds
+        """
+        with self._lock:
+            self._last_used = time.monotonic()
+            if not self._running or self._last_used - self._latest_time > self.stale_after:
+                return None
+            if self.decode_in_background:
+                return self._latest
+            ret, frame = self.cap.retrieve()
+        
+        if ret and frame is not None:
+            return frame
+        
+        return None
+    
+    def properties(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the source's frame size, frame rate and backend
+        
+        Returns:
+            Dictionary with width, height, fps and backend, or None if the
+            source is no longer open
+        """
+        with self._lock:
+            if not self._running:
+                return None
+            return {
+                "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": self.cap.get(cv2.CAP_PROP_FPS),
+                "backend": self.cap.getBackendName()
+            }
+    
+    def stop(self):
+        """Stop the read loop and release the source"""
+        self._running = False
+        if self._thread is None:
+            self.cap.release()
+        else:
+            # The read thread releases the capture once its current grab or
+            # read returns
+            self._thread.join(timeout=1)
+
+
+def _gstreamer_available() -> bool:
+    """Check whether OpenCV was built with the GStreamer backend"""
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith("GStreamer:"):
+            return "YES" in line
+    return False
+
+
+def _is_safe_stream_url(url: str) -> bool:
+    """
+    Check that a stream URL is well formed and can be embedded in a pipeline
+    
+    The URL ends up inside a GStreamer pipeline description, where
+    whitespace, "!" and quotes would start new elements or properties, so
+    any of those (and control characters) reject the URL.
+    """
+    if any(c.isspace() or ord(c) < 32 or ord(c) == 127 or c in "!\"'\\" for c in url):
+        return False
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ("rtsp", "http", "https") and bool(parts.hostname)
+
+
+def _stream_pipeline(url: str) -> str:
+    """
+    Build a GStreamer pipeline for a network stream
+    
+    decodebin picks a hardware decoder (VA-API, NVDEC, Jetson) when one is
+    installed, and the appsink keeps a single buffer so frames never queue up.
+    """
+    if not _is_safe_stream_url(url):
+        raise ValueError(f"Unsafe stream URL: {url!r}")
+    if url.startswith("rtsp://"):
+        src = f'rtspsrc location="{url}" latency=0'
+    else:
+        src = f'souphttpsrc location="{url}" is-live=true'
+    return (f"{src} ! decodebin ! videoconvert ! video/x-raw,format=BGR ! "
+            f"appsink drop=1 max-buffers=1 sync=false")
 
 
 class CameraManager:
     """Manages camera sources and frame capture"""
     
+    # Open frame grabbers for live capture, keyed by camera index or stream URL
+    _grabbers: Dict[Any, FrameGrabber] = {}
+    _grabbers_lock = threading.Lock()
+    
+    # Seconds a live camera stays open without being polled
+    GRABBER_IDLE_TIMEOUT = 60.0
+    
+    # Hosts network streams may be opened from, as registered by the backend
+    # in OPENCV_STREAM_HOSTS (comma-separated); stream URLs for any other host
+    # are rejected, so callers cannot make the service connect anywhere
+    STREAM_HOSTS = {host.strip().lower()
+                    for host in os.environ.get("OPENCV_STREAM_HOSTS", "").split(",")
+                    if host.strip()}
+    
+    @staticmethod
+    def _running_grabber(key: Any) -> Optional[FrameGrabber]:
+        """
+        Return the open frame grabber for a camera index or stream URL
+        
+        Some backends (DirectShow/MSMF on Windows) allow only one open handle
+        per camera, so anything that wants to touch a camera that is already
+        being captured has to go through its grabber. Grabbers that stopped
+        (idle, source ended) are dropped here.
+        
+        Args:
+            key: Camera index or stream URL
+            
+        Returns:
+            The running FrameGrabber, or None if there is none
+        """
+        with CameraManager._grabbers_lock:
+            grabber = CameraManager._grabbers.get(key)
+            if grabber is not None and not grabber.running:
+                CameraManager._grabbers.pop(key, None)
+                grabber = None
+        return grabber
+    
     @staticmethod
     def list_available_cameras(max_check: int = 10) -> List[Dict[str, Any]]:
         """
@@ -26,6 +279,23 @@ class CameraManager:
         
         # Check standard camera indices (0-9)
         for i in range(max_check):
+            grabber = CameraManager._running_grabber(i)
+            if grabber is not None:
+                # Already open for live capture; don't open it a second time
+                properties = grabber.properties() if grabber.read() is not None else None
+                if properties is not None:
+                    available_cameras.append({
+                        "index": i,
+                        "name": f"Camera {i}",
+                        "type": "webcam",
+                        "width": properties["width"],
+                        "height": properties["height"],
+                        "fps": properties["fps"] if properties["fps"] > 0 else 30,
+                        "backend": properties["backend"],
+                        "source": f"camera://{i}"
+                    })
+                continue
+            
             cap = cv2.VideoCapture(i)
             if cap.isOpened():
                 # Try to read a frame to verify it works
@@ -79,6 +349,10 @@ class CameraManager:
                 return None  # File sources handled by load_image
             return None
         
+        grabber = CameraManager._running_grabber(camera_index)
+        if grabber is not None:
+            return grabber.read()
+        
         # Open camera
         cap = cv2.VideoCapture(camera_index)
         
@@ -97,6 +371,87 @@ class CameraManager:
         
         return None
     
+    @staticmethod
+    def is_stream_source(source: str) -> bool:
+        """
+        Check if a source is a network stream (IP camera) the service may open
+        
+        Args:
+            source: Capture source string
+            
+        Returns:
+            True for well-formed RTSP/HTTP stream URLs whose host is listed
+            in STREAM_HOSTS
+        """
+        if not source.startswith(("rtsp://", "http://", "https://")):
+            return False
+        if not _is_safe_stream_url(source):
+            return False
+        return urlsplit(source).hostname in CameraManager.STREAM_HOSTS
+    
+    @staticmethod
+    def capture_latest_frame(source: str) -> Optional[np.ndarray]:
+        """
+        Capture the most recent frame from a camera source, keeping the camera
+        open between calls
+        
+        The first call for a camera starts a FrameGrabber; later calls only
+        fetch the frame it read last, so repeated polling neither pays the
+        camera open cost nor reads frames queued in the driver buffer.
+        Network streams (RTSP/HTTP) are decoded in the grabber thread, through
+        a GStreamer hardware-decode pipeline when OpenCV supports it.
+        
+        Args:
+            source: Camera source (e.g., "camera://0", "0" or "rtsp://...")
+            
+        Returns:
+            Captured frame as numpy array, or None if failed
+        """
+        if source.startswith("camera://"):
+            try:
+                key = int(source.replace("camera://", ""))
+            except ValueError:
+                return None
+        elif source.isdigit():
+            key = int(source)
+        elif CameraManager.is_stream_source(source):
+            key = source
+        else:
+            return None
+        
+        idle_timeout = CameraManager.GRABBER_IDLE_TIMEOUT
+        with CameraManager._grabbers_lock:
+            grabber = CameraManager._grabbers.get(key)
+            if grabber is not None and not grabber.running:
+                # Closed after sitting idle (or the source ended); reopen it
+                grabber = None
+            if grabber is None:
+                if isinstance(key, int):
+                    grabber = FrameGrabber(key, idle_timeout=idle_timeout)
+                elif _gstreamer_available():
+                    grabber = FrameGrabber(_stream_pipeline(key), cv2.CAP_GSTREAMER,
+                                           decode_in_background=True,
+                                           idle_timeout=idle_timeout)
+                else:
+                    grabber = FrameGrabber(key, cv2.CAP_FFMPEG, decode_in_background=True,
+                                           idle_timeout=idle_timeout)
+                if not grabber.start():
+                    grabber.stop()
+                    CameraManager._grabbers.pop(key, None)
+                    return None
+                CameraManager._grabbers[key] = grabber
+        
+        frame = grabber.read()
+        if frame is None:
+            # Camera went away; drop the grabber so the next call reopens it,
+            # unless another request already replaced it with a new one
+            with CameraManager._grabbers_lock:
+                if CameraManager._grabbers.get(key) is grabber:
+                    CameraManager._grabbers.pop(key)
+            grabber.stop()
+        
+        return frame
+    
     @staticmethod
     def test_camera_connection(source: str) -> Dict[str, Any]:
         """
@@ -132,6 +487,20 @@ class CameraManager:
                     result["message"] = "File not found"
                     return result
             
+            grabber = CameraManager._running_grabber(camera_index)
+            if grabber is not None:
+                # Already open for live capture; test through the grabber
+                properties = grabber.properties() if grabber.read() is not None else None
+                if properties is None:
+                    result["message"] = f"Camera {camera_index} opened but could not read frame"
+                    return result
+                result["success"] = True
+                result["width"] = properties["width"]
+                result["height"] = properties["height"]
+                result["fps"] = properties["fps"]
+                result["message"] = f"Camera {camera_index} connected successfully"
+                return result
+            
             cap = cv2.VideoCapture(camera_index)
             
             if not cap.isOpened():
@@ -6,15 +6,31 @@ Based on user-provided cvzone/OpenCV implementation.
 import cv2
 import numpy as np
 import os
+import time
 from typing import List, Dict, Any
+from utils import binary_median_blur
+
+def is_axis_aligned(pts):
+    # True for a 4-point polygon that is an upright rectangle, i.e. it fills
+    # its whole bounding rect
+    if len(pts) != 4:
+        return False
+    xs = np.unique(pts[:, 0])
+    ys = np.unique(pts[:, 1])
+    return len(xs) == 2 and len(ys) == 2 and len(np.unique(pts, axis=0)) == 4
 
 class ParkingLotTracker:
-    def __init__(self, threshold_val=900):
+    def __init__(self, threshold_val=900, debug=False):
         # User reference hardcoded parameters
         self.val1 = 25  # Adaptive Threshold Block Size
         self.val2 = 16  # Adaptive Threshold C
         self.val3 = 5   # Median Blur
+        self.kernel = np.ones((3, 3), np.uint8)  # Dilate
         self.threshold_val = threshold_val # User ref: count < 900 is Free
+        self._mask_cache = None  # (key, per-slot crop rects and masks)
+        self.debug = debug  # Save processed frames for inspection
+        self.debug_interval = 1.0  # Seconds between debug frame writes
+        self._last_debug_write = 0.0
 
     def preprocess_image(self, img):
         # EXACT User Reference Pipeline
@@ -25,15 +41,74 @@ class ParkingLotTracker:
         imgThres = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                                          cv2.THRESH_BINARY_INV, self.val1, self.val2)
         
-        # Median Blur
-        imgThres = cv2.medianBlur(imgThres, self.val3)
+        # Median Blur (box-filter majority vote, identical on a binary image)
+        imgThres = binary_median_blur(imgThres, self.val3)
         
         # Dilate
-        kernel = np.ones((3, 3), np.uint8)
-        imgDilate = cv2.dilate(imgThres, kernel, iterations=1)
+        imgDilate = cv2.dilate(imgThres, self.kernel, iterations=1)
         
         return imgDilate
 
+    def slots_to_pixels(self, slots, img_width, img_height):
+        # Gather every slot's normalized points and scale them to pixels in
+        # one vectorized multiply instead of per-point Python arithmetic
+        points = []
+        scales = []
+        counts = []
+        for slot in slots:
+            coords = []
+            try:
+                s_width = slot.get('image_width') or slot.get('imageWidth') or img_width
+                s_height = slot.get('image_height') or slot.get('imageHeight') or img_height
+                for coord in slot.get('coordinates', []):
+                    # Handle both [x, y] list and {'x': x, 'y': y} dict
+                    if isinstance(coord, dict):
+                        coords.append((float(coord.get('x', 0)), float(coord.get('y', 0))))
+                    elif isinstance(coord, (list, tuple)):
+                        coords.append((float(coord[0]), float(coord[1])))
+            except Exception as e:
+                print(f"[ERROR] Slot coordinate error: {e}")
+                coords = []
+            points.extend(coords)
+            scales.extend([(s_width, s_height)] * len(coords))
+            counts.append(len(coords))
+
+        # float64 keeps int() truncation identical to the scalar conversion
+        pixels = (np.array(points, dtype=np.float64).reshape(-1, 2) *
+                  np.array(scales, dtype=np.float64).reshape(-1, 2)).astype(np.int32)
+        return np.split(pixels, np.cumsum(counts)[:-1])
+
+    def slot_crop_masks(self, shape, slot_pixels):
+        # Per-slot (x, y, w, h, upright, mask) for the bounding-rect crop, None
+        # for a slot without points. Slots don't move between frames, so the masks
+        # are built once and reused for as long as the layout stays the same.
+        key = (shape, tuple(pts.tobytes() for pts in slot_pixels))
+        if self._mask_cache is not None and self._mask_cache[0] == key:
+            return self._mask_cache[1]
+
+        rows, cols = range(shape[0]), range(shape[1])
+        crops = []
+        for pts in slot_pixels:
+            if len(pts) == 0:
+                crops.append(None)
+                continue
+
+            x, y, w, h = cv2.boundingRect(pts)
+            if y+h > shape[0]: h = shape[0] - y
+            if x+w > shape[1]: w = shape[1] - x
+
+            # Mask within crop to handle rotation/polygons precisely; the crop
+            # shape follows the same slicing the frame crop will use
+            mask_roi = np.zeros((len(rows[y:y+h]), len(cols[x:x+w])), dtype=np.uint8)
+            try:
+                cv2.fillPoly(mask_roi, [pts - [x, y]], 255)
+            except cv2.error:
+                mask_roi = None  # empty crop, the slot lies outside the frame
+            crops.append((x, y, w, h, is_axis_aligned(pts), mask_roi))
+
+        self._mask_cache = (key, crops)
+        return crops
+
     def detect_occupancy(self, image_path: str, slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         print(f"[TRACKER] processing image: {image_path} with {len(slots)} slots")
         
@@ -49,72 +124,58 @@ class ParkingLotTracker:
 
         results = []
 
-        # Save Debug Frame
-        try:
-             # Save to client root to be accessible via Vite dev server
-            debug_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(image_path))), 'client', 'debug_frame.jpg')
-            if 'server' in os.getcwd():
-                debug_path = os.path.abspath(os.path.join(os.getcwd(), '..', 'client', 'debug_frame.jpg'))
-            
-            cv2.imwrite(debug_path, imgPro)
-            print(f"[DEBUG] Saved processed frame to {debug_path}")
-        except:
-            pass
+        # Save Debug Frame (JPEG encode + disk write, so off unless debugging)
+        if self.debug and time.monotonic() - self._last_debug_write > self.debug_interval:
+            self._last_debug_write = time.monotonic()
+            try:
+                 # Save to client root to be accessible via Vite dev server
+                debug_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(image_path))), 'client', 'debug_frame.jpg')
+                if 'server' in os.getcwd():
+                    debug_path = os.path.abspath(os.path.join(os.getcwd(), '..', 'client', 'debug_frame.jpg'))
+                
+                cv2.imwrite(debug_path, imgPro)
+                print(f"[DEBUG] Saved processed frame to {debug_path}")
+            except:
+                pass
 
-        for slot in slots:
+        # Convert normalized to pixel coords for all slots at once
+        slot_pixels = self.slots_to_pixels(slots, img_width, img_height)
+
+        # Crop rects and polygon masks, cached across frames
+        crops = self.slot_crop_masks(imgPro.shape, slot_pixels)
+
+        for slot, pts, crop in zip(slots, slot_pixels, crops):
             try:
                 # Extract coordinates - handle multiple naming conventions
                 coordinates = slot.get('coordinates', [])
                 slot_id = slot.get('slot_id') or slot.get('slotId')
                 slot_num = slot.get('slot_number') or slot.get('slotNumber')
-                
-                # Default dims if missing
-                s_width = slot.get('image_width') or slot.get('imageWidth') or img_width
-                s_height = slot.get('image_height') or slot.get('imageHeight') or img_height
 
                 if not coordinates:
                     print(f"[WARN] Slot {slot_num} has no coordinates")
                     continue
-
-                # Create mask for polygon (User Code supported rects, we adapt for polygons)
-                mask = np.zeros(imgPro.shape, dtype=np.uint8)
-                
-                # Convert normalized to pixel coords
-                pixel_coords = []
-                for coord in coordinates:
-                    # Handle both [x, y] list and {'x': x, 'y': y} dict
-                    if isinstance(coord, dict):
-                        x_norm = coord.get('x', 0)
-                        y_norm = coord.get('y', 0)
-                    elif isinstance(coord, (list, tuple)):
-                        x_norm = coord[0]
-                        y_norm = coord[1]
-                    else:
-                        continue
-                        
-                    pixel_coords.append([
-                        int(x_norm * s_width),
-                        int(y_norm * s_height)
-                    ])
-                
-                pts = np.array(pixel_coords, np.int32)
-                
-                # Bounding Rect
-                x, y, w, h = cv2.boundingRect(pts)
-                
-                # Start with crop
-                if y+h > imgPro.shape[0]: h = imgPro.shape[0] - y
-                if x+w > imgPro.shape[1]: w = imgPro.shape[1] - x
                 
-                imgCrop = imgPro[y:y+h, x:x+w]
-                
-                # Mask within crop to handle rotation/polygons precisely
-                mask_roi = np.zeros(imgCrop.shape, dtype=np.uint8)
-                pts_shifted = pts - [x, y]
-                cv2.fillPoly(mask_roi, [pts_shifted], 255)
-                imgCropMasked = cv2.bitwise_and(imgCrop, imgCrop, mask=mask_roi)
+                if crop is None:
+                    print(f"[WARN] Slot {slot_num} has no valid coordinates")
+                    continue
+
+                # Bounding Rect, clipped to the frame
+                x, y, w, h, upright, mask_roi = crop
+                imgCrop = imgPro[y:y+h, x:x+w]  # view, no copy
                 
-                count = cv2.countNonZero(imgCropMasked)
+                if imgCrop.size and not imgCrop.any():
+                    # Nothing white in the crop, no need for a mask
+                    count = 0
+                elif upright and x >= 0 and y >= 0 and w > 0 and h > 0 and imgCrop.size:
+                    # Upright rectangle covers the whole crop (a rect outside
+                    # the frame has an empty crop and takes the skip path)
+                    count = cv2.countNonZero(imgCrop)
+                else:
+                    if mask_roi is None:
+                        raise ValueError(f"slot region {x, y, w, h} lies outside the image")
+                    imgCropMasked = cv2.bitwise_and(imgCrop, imgCrop, mask=mask_roi)
+                    
+                    count = cv2.countNonZero(imgCropMasked)
                 area = w * h 
                 if area == 0: area = 1
 
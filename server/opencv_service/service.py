@@ -9,6 +9,7 @@ from flask_cors import CORS
 import os
 import json
 import tempfile
+import threading
 from typing import Dict, Any, List
 from occupancy_detector import OccupancyDetector
 from slot_selector import SlotSelector
@@ -19,11 +20,16 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for Node.js backend
 
 from parking_lot_tracker import ParkingLotTracker
-from yolo_detector import YOLODetector
+from yolo_detector import YOLODetector, OccupancyBatcher
 
 # Global detector instances
-detector = ParkingLotTracker(threshold_val=800)  # Classical detection
+detector = ParkingLotTracker(  # Classical detection
+    threshold_val=800,
+    debug=os.environ.get('OPENCV_DEBUG_FRAMES') == '1'
+)
 yolo_detector = None  # YOLO detection (lazy-loaded)
+yolo_batcher = None  # Batches concurrent YOLO requests into one predict call
+yolo_lock = threading.Lock()  # Only one request creates the YOLO detector
 
 
 @app.route('/health', methods=['GET'])
@@ -238,7 +244,15 @@ def detect_occupancy():
         if not slots:
             return jsonify({"success": False, "error": "slots array is required"}), 400
         
-        if not os.path.exists(image_path):
+        if (image_path.startswith(("rtsp://", "http://", "https://"))
+                and not CameraManager.is_stream_source(image_path)):
+            return jsonify({"success": False, "error": f"Stream source not allowed: {image_path}"}), 400
+        
+        is_camera = (image_path.startswith("camera://")
+                     or (len(image_path) == 1 and image_path.isdigit())
+                     or CameraManager.is_stream_source(image_path))
+        
+        if not is_camera and not os.path.exists(image_path):
             return jsonify({"success": False, "error": f"Image/Video file not found: {image_path}"}), 404
         
         # Override threshold if provided
@@ -249,9 +263,9 @@ def detect_occupancy():
         video_frame = data.get('video_frame', 0)
         
         # Check if it's a camera source
-        if image_path.startswith("camera://") or (len(image_path) == 1 and image_path.isdigit()):
+        if is_camera:
             # Capture frame from camera
-            frame = CameraManager.capture_frame_from_camera(image_path)
+            frame = CameraManager.capture_latest_frame(image_path)
             if frame is None:
                 return jsonify({"success": False, "error": f"Could not capture frame from camera: {image_path}"}), 400
             
@@ -402,7 +416,7 @@ def detect_yolo():
         "total_vehicles_detected": 5
     }
     """
-    global yolo_detector
+    global yolo_detector, yolo_batcher
     
     try:
         data = request.json
@@ -418,29 +432,36 @@ def detect_yolo():
         if not os.path.exists(image_path):
             return jsonify({"success": False, "error": f"Image file not found: {image_path}"}), 404
         
-        # Lazy-load YOLO detector
-        if yolo_detector is None:
-            model_path = data.get('model_path', 'models/yolo11s.pt')
-            conf_threshold = data.get('conf_threshold', 0.35)
-            iou_threshold = data.get('iou_threshold', 0.45)
-            occupied_threshold = data.get('occupied_threshold', 0.30)
+        # Lazy-load YOLO detector. TensorRT/OpenVINO export takes minutes, so
+        # it is not run inside a request; an exported model is only picked up
+        # if one was made beforehand (python yolo_detector.py --export ...)
+        with yolo_lock:
+            if yolo_detector is None:
+                model_path = data.get('model_path', 'models/yolo11s.pt')
+                conf_threshold = data.get('conf_threshold', 0.35)
+                iou_threshold = data.get('iou_threshold', 0.45)
+                occupied_threshold = data.get('occupied_threshold', 0.30)
+                
+                try:
+                    yolo_detector = YOLODetector(
+                        model_path=model_path,
+                        conf_threshold=conf_threshold,
+                        iou_threshold=iou_threshold,
+                        occupied_threshold=occupied_threshold,
+                        auto_export=False
+                    )
+                except Exception as e:
+                    return jsonify({
+                        "success": False,
+                        "error": f"Failed to load YOLO model: {str(e)}",
+                        "hint": "Make sure yolo11s.pt is in the models/ directory and ultralytics is installed"
+                    }), 500
             
-            try:
-                yolo_detector = YOLODetector(
-                    model_path=model_path,
-                    conf_threshold=conf_threshold,
-                    iou_threshold=iou_threshold,
-                    occupied_threshold=occupied_threshold
-                )
-            except Exception as e:
-                return jsonify({
-                    "success": False,
-                    "error": f"Failed to load YOLO model: {str(e)}",
-                    "hint": "Make sure yolo11s.pt is in the models/ directory and ultralytics is installed"
-                }), 500
-        
-        # Run YOLO detection
-        results = yolo_detector.detect_occupancy(image_path, slots)
+            if yolo_batcher is None:
+                yolo_batcher = OccupancyBatcher(yolo_detector)
+        
+        # Run YOLO detection, batched with any concurrent requests
+        results = yolo_batcher.submit(image_path, slots)
         
         # Count total vehicles detected
         total_vehicles = sum(1 for r in results if r.get('vehicle_metadata'))
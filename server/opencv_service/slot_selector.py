@@ -37,6 +37,9 @@ class SlotSelector:
             raise ValueError(f"Could not load image from {image_path}")
         
         self.display_image = self.image.copy()
+        self.slots_layer = self.image.copy()  # Image with completed slots drawn
+        self.slots_drawn = 0  # Number of slots already drawn on slots_layer
+        self.display_dirty = True  # display_image changed since last imshow
         self.slots = []  # List of slot regions
         self.current_slot = []  # Current slot being defined
         self.window_name = "Parking Slot Selector - Left click to add, Right click to remove, 'n' for next, 's' to save"
@@ -64,19 +67,22 @@ class SlotSelector:
     
     def update_display(self):
         """Update the display image with current slots and current selection"""
-        self.display_image = self.image.copy()
-        
-        # Draw all completed slots
-        for i, slot in enumerate(self.slots):
+        # Completed slots never change, so draw each one onto the cached
+        # layer once instead of redrawing all of them on every click
+        for i in range(self.slots_drawn, len(self.slots)):
+            slot = self.slots[i]
             if len(slot) >= 3:  # Need at least 3 points for a polygon
                 pts = np.array(slot, np.int32)
-                cv2.polylines(self.display_image, [pts], True, (0, 255, 0), 2)
+                cv2.polylines(self.slots_layer, [pts], True, (0, 255, 0), 2)
                 # Draw slot number
                 if slot:
                     center = np.mean(slot, axis=0, dtype=np.int32)
-                    cv2.putText(self.display_image, f"S{i+1}", 
+                    cv2.putText(self.slots_layer, f"S{i+1}", 
                               (center[0]-10, center[1]), 
                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        self.slots_drawn = len(self.slots)
+        
+        self.display_image = self.slots_layer.copy()
         
         # Draw current slot being defined
         if len(self.current_slot) > 1:
@@ -88,6 +94,8 @@ class SlotSelector:
         # Draw points
         for point in self.current_slot:
             cv2.circle(self.display_image, point, 5, (0, 0, 255), -1)
+        
+        self.display_dirty = True
     
     def run(self) -> List[Dict[str, Any]]:
         """
@@ -102,8 +110,12 @@ class SlotSelector:
         self.update_display()
         
         while True:
-            cv2.imshow(self.window_name, self.display_image)
-            key = cv2.waitKey(1) & 0xFF
+            # Only push a new frame to the window when something was drawn;
+            # waitKey keeps servicing window events in between
+            if self.display_dirty:
+                cv2.imshow(self.window_name, self.display_image)
+                self.display_dirty = False
+            key = cv2.waitKey(20) & 0xFF
             
             if key == ord('n'):
                 # Finish current slot and start new one
@@ -11,6 +11,9 @@ def test_camera(index=0):
     
     print(f"Camera {index} opened successfully.")
     
+    # Keep at most one frame queued so reads are not stale
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
     # Try to read a frame
     ret, frame = cap.read()
     if not ret:
@@ -3,11 +3,195 @@ YOLO-based Vehicle Detection Module
 Adapted from test22.py for Smart Parking System integration
 """
 import cv2
+import functools
 import json
 import numpy as np
 from ultralytics import YOLO
 import os
-from typing import List, Dict, Any, Tuple, Optional
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Union
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; helpers below run as plain Python
+    NUMBA_AVAILABLE = False
+
+# Below this many slot x vehicle pairs the compiled loop beats NumPy dispatch
+NUMBA_MAX_PAIRS = 512
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):  # optional; falls back to OpenCV decoding
+    _turbojpeg = None
+
+
+def _iou(x1_min, y1_min, x1_max, y1_max, x2_min, y2_min, x2_max, y2_max):
+    """Scalar IoU of two boxes given as corner coordinates."""
+    # Calculate intersection area
+    inter_x_min = max(x1_min, x2_min)
+    inter_y_min = max(y1_min, y2_min)
+    inter_x_max = min(x1_max, x2_max)
+    inter_y_max = min(y1_max, y2_max)
+    
+    if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
+        return 0.0
+    
+    inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
+    
+    # Calculate union area
+    box1_area = (x1_max - x1_min) * (y1_max - y1_min)
+    box2_area = (x2_max - x2_min) * (y2_max - y2_min)
+    union_area = box1_area + box2_area - inter_area
+    
+    return inter_area / union_area if union_area > 0 else 0.0
+
+
+def _poly_bbox(pts):
+    """Bounding box [x_min, y_min, x_max, y_max] of an (N, 2) float array."""
+    x_min = x_max = pts[0, 0]
+    y_min = y_max = pts[0, 1]
+    for i in range(1, pts.shape[0]):
+        x_min = min(x_min, pts[i, 0])
+        x_max = max(x_max, pts[i, 0])
+        y_min = min(y_min, pts[i, 1])
+        y_max = max(y_max, pts[i, 1])
+    return np.array([x_min, y_min, x_max, y_max])
+
+
+def _best_iou(slots, vehicles, clipped, stop_iou):
+    """
+    For each slot box, the highest IoU with any vehicle box and that vehicle's index.
+    
+    Once a vehicle not flagged in clipped has an IoU above stop_iou, the
+    remaining unflagged vehicles are skipped (flagged ones are still
+    checked); pass a stop_iou of at least 1 to always scan all of them.
+    """
+    n_slots = slots.shape[0]
+    best_iou = np.zeros(n_slots, dtype=np.float32)
+    best_idx = np.zeros(n_slots, dtype=np.int64)
+    for i in range(n_slots):
+        sx1, sy1, sx2, sy2 = slots[i, 0], slots[i, 1], slots[i, 2], slots[i, 3]
+        slot_area = (sx2 - sx1) * (sy2 - sy1)
+        settled = False
+        for j in range(vehicles.shape[0]):
+            if settled and not clipped[j]:
+                continue
+            vx1, vy1, vx2, vy2 = vehicles[j, 0], vehicles[j, 1], vehicles[j, 2], vehicles[j, 3]
+            iw = min(sx2, vx2) - max(sx1, vx1)
+            ih = min(sy2, vy2) - max(sy1, vy1)
+            if iw <= 0 or ih <= 0:
+                continue
+            inter = iw * ih
+            union = slot_area + (vx2 - vx1) * (vy2 - vy1) - inter
+            if union > 0 and inter / union > best_iou[i]:
+                best_iou[i] = inter / union
+                best_idx[i] = j
+                if best_iou[i] > stop_iou and not clipped[j]:
+                    settled = True
+    return best_iou, best_idx
+
+
+if NUMBA_AVAILABLE:
+    _iou = njit(cache=True, fastmath=True)(_iou)
+    _poly_bbox = njit(cache=True, fastmath=True)(_poly_bbox)
+    # No fastmath here so results match the NumPy path bit for bit
+    _best_iou = njit(cache=True)(_best_iou)
+
+
+# imread flags that let libjpeg scale down while decoding (DCT scaling)
+_REDUCED_COLOR_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+@functools.lru_cache(maxsize=4)
+def _jpeg_frame_size(path: str, mtime_ns: int, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from a JPEG header without decoding the image.
+    
+    Returns None for other formats, for photos with EXIF data (their
+    orientation may swap the decoded dimensions) and for headers that
+    cannot be parsed.
+    """
+    with open(path, "rb") as f:
+        buf = f.read(65536)
+    if buf[:2] != b"\xff\xd8" or b"Exif\x00" in buf[:4096]:
+        return None
+    
+    pos = 2
+    while pos + 9 < len(buf):
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # fill byte
+            continue
+        # Start-of-frame markers, excluding DHT, JPG and DAC
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(buf[pos + 5:pos + 7], "big")
+            width = int.from_bytes(buf[pos + 7:pos + 9], "big")
+            return (width, height) if width and height else None
+        pos += 2 + int.from_bytes(buf[pos + 2:pos + 4], "big")
+    return None
+
+
+@functools.lru_cache(maxsize=4)
+def _decode_image_file(path: str, mtime_ns: int, size: int, reduce: int = 1) -> Optional[np.ndarray]:
+    """
+    Decode an image file, cached by path and modification time.
+    
+    The same frame is typically decoded for detection and again for
+    visualization; the cache serves the second read. Returned arrays are
+    shared between callers, so they are marked read-only.
+    
+    With reduce of 2, 4 or 8 a JPEG is decoded at that fraction of its
+    resolution; other formats fall back to a full decode.
+    """
+    with open(path, "rb") as f:
+        buf = f.read()
+    
+    img = None
+    if reduce in _REDUCED_COLOR_FLAGS:
+        img = cv2.imdecode(np.frombuffer(buf, np.uint8), _REDUCED_COLOR_FLAGS[reduce])
+    # TurboJPEG ignores EXIF orientation, so leave rotated photos to OpenCV
+    if img is None and _turbojpeg is not None and buf[:2] == b"\xff\xd8" and b"Exif\x00" not in buf[:4096]:
+        try:
+            img = _turbojpeg.decode(buf, pixel_format=TJPF_BGR)
+        except Exception:
+            img = None
+    if img is None:
+        img = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        img = cv2.imread(path)
+    
+    if img is not None:
+        img.flags.writeable = False
+    return img
+
+
+# COCO class ids treated as vehicles
+VEHICLE_CLASSES = {2: 'car', 5: 'bus', 7: 'truck'}
+
+# Exports of the same weights and settings write the same target path, so
+# only one export runs at a time in this process
+_export_lock = threading.Lock()
+
+
+def _cuda_available() -> bool:
+    """Check whether a CUDA device is usable for inference."""
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
 
 
 class YOLODetector:
@@ -21,7 +205,15 @@ class YOLODetector:
         model_path: str = "models/yolo11s.pt",
         conf_threshold: float = 0.35,
         iou_threshold: float = 0.45,
-        occupied_threshold: float = 0.30
+        occupied_threshold: float = 0.30,
+        batch_size: int = 4,
+        imgsz: int = 640,
+        half: bool = True,
+        motion_threshold: float = 0.005,
+        motion_refresh_interval: int = 10,
+        auto_export: bool = True,
+        quantize: bool = False,
+        calib_data: Optional[str] = None
     ):
         """
         Initialize YOLO detector.
@@ -31,69 +223,443 @@ class YOLODetector:
             conf_threshold: Confidence threshold for vehicle detection
             iou_threshold: IoU threshold for NMS (Non-Maximum Suppression)
             occupied_threshold: Minimum IoU to consider slot occupied
+            batch_size: Number of frames sent to the model per predict call
+            imgsz: Inference image size (must match the size used for export)
+            half: Run FP16 inference (ignored without a CUDA device)
+            motion_threshold: Fraction of any one slot's pixels that must change
+                since the last detection to run YOLO again (0 disables motion
+                gating)
+            motion_refresh_interval: Run YOLO at least every N calls even
+                without motion
+            auto_export: Export the weights to TensorRT (CUDA) or OpenVINO (CPU)
+                on first load if no exported model exists yet
+            quantize: On CPU hosts, use an INT8 OpenVINO model instead of FP16
+            calib_data: Calibration dataset YAML for INT8 export (see calib.py)
         """
         self.model_path = model_path
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
         self.occupied_threshold = occupied_threshold
+        self.batch_size = max(1, int(batch_size))
+        self.imgsz = imgsz
+        # FP16 predict is only requested on CUDA; other backends keep their own precision
+        self.half = half and _cuda_available()
         self.model = None
+        self.motion_threshold = motion_threshold
+        self.motion_refresh_interval = max(1, int(motion_refresh_interval))
+        self.auto_export = auto_export
+        self.quantize = quantize
+        self.calib_data = calib_data
+        self._vehicle_classes = list(VEHICLE_CLASSES)
+        self._slot_cache = None
+        self._buffers = threading.local()  # Per-thread resize output buffer
+        
+        # Ultralytics predictors are not thread-safe; every predict call runs
+        # on this single worker so concurrent requests queue for the model
+        # while their decoding and post-processing stay in parallel
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yolo-predict")
+        
+        # Motion gating state: reference frame from the last YOLO run. Callers
+        # on different threads share it, so it is only read and written under
+        # _state_lock (the slot cache is swapped as a whole tuple instead)
+        self._state_lock = threading.Lock()
+        self._motion_regions = None
+        self._ref_gray = None
+        self._ref_geometry = None
+        self._last_boxes = None
+        
+        # Frame and vehicles of the last detect_occupancy call, for visualization
+        self._last_detection = None
+        self._calls_since_detect = 0
         
         print(f"[YOLO] Initializing detector with model: {model_path}")
         self._load_model()
     
     def _load_model(self):
-        """Load YOLO model from file."""
+        """Load YOLO model, preferring an exported TensorRT/OpenVINO model."""
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"YOLO model not found: {self.model_path}")
         
+        model_path = self._exported_model_path()
+        if model_path is None and self.auto_export:
+            model_path = self._export_for_device()
+        model_path = model_path or self.model_path
+        
         try:
-            self.model = YOLO(self.model_path)
-            print(f"[YOLO] Model loaded successfully")
+            self.model = YOLO(model_path, task="detect")
+            print(f"[YOLO] Model loaded successfully from {model_path}")
         except Exception as e:
             raise RuntimeError(f"Failed to load YOLO model: {e}")
+        
+        # Compile the JIT helpers now so the first request doesn't pay for it
+        _iou(0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 1.0)
+        _poly_bbox(np.zeros((4, 2)))
+        _best_iou(np.zeros((1, 4), dtype=np.float32), np.zeros((1, 4), dtype=np.float32),
+                  np.ones(1, dtype=np.bool_), 1.0)
+        
+        # Warm up the model at the inference size so backend setup and
+        # autotuning happen here rather than on the first request
+        try:
+            self._predict(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+        except Exception as e:
+            print(f"[YOLO] Warning: model warmup failed: {e}")
+    
+    def _artifact_path(self, format: str, int8: bool = False) -> str:
+        """
+        Path an exported model is stored at next to the PyTorch weights.
+        
+        The inference size and batch size are part of the name, so a model
+        exported for other settings is never picked up by mistake.
+        
+        Args:
+            format: Export format ("engine", "openvino" or "onnx")
+            int8: Whether the model is INT8 quantized
+            
+        Returns:
+            Path of the exported file or model directory
+        """
+        stem = os.path.splitext(self.model_path)[0]
+        tag = f"{stem}_{self.imgsz}_b{self.batch_size}{'_int8' if int8 else ''}"
+        if format == "openvino":
+            return f"{tag}_openvino_model"
+        return f"{tag}.{format}"
+    
+    def _exported_model_path(self) -> Optional[str]:
+        """
+        Find an exported model next to the PyTorch weights.
+        
+        Returns:
+            Path to a TensorRT engine (when CUDA is available) or an OpenVINO
+            model directory (INT8 when quantize is set on CPU hosts) exported
+            for the current imgsz and batch_size, or None if there is none
+        """
+        candidates = []
+        if _cuda_available():
+            candidates.append(self._artifact_path("engine"))
+            candidates.append(self._artifact_path("openvino"))
+        elif self.quantize:
+            candidates.append(self._artifact_path("openvino", int8=True))
+        else:
+            candidates.append(self._artifact_path("openvino"))
+        
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+    
+    def _export_for_device(self) -> Optional[str]:
+        """
+        Export an optimized model for this host.
+        
+        TensorRT FP16 with CUDA; otherwise OpenVINO, quantized to INT8 with
+        calib_data when quantize is set and FP16 if not.
+        
+        Returns:
+            Path to the exported model, or None if export failed (the
+            PyTorch weights are used instead)
+        """
+        if _cuda_available():
+            format, options = "engine", {"half": True}
+        elif self.quantize:
+            format, options = "openvino", {"int8": True, "data": self.calib_data}
+            if not self.calib_data:
+                print("[YOLO] Warning: no calib_data given, INT8 calibration uses "
+                      "the Ultralytics default dataset")
+                del options["data"]
+        else:
+            format, options = "openvino", {"half": True}
+        
+        print(f"[YOLO] No exported model found, exporting to {format} (one-time)")
+        try:
+            return self.export_model(format, **options)
+        except Exception as e:
+            print(f"[YOLO] Warning: {format} export failed, using PyTorch weights: {e}")
+            return None
+    
+    def export_model(self, format: str = "engine", **kwargs) -> str:
+        """
+        Export the PyTorch weights to an optimized inference runtime.
+        
+        This is a one-time step; the exported model is written next to the
+        weights (see _artifact_path) and picked up by _load_model on the next
+        start with the same imgsz and batch_size.
+        
+        Models are exported with a dynamic batch dimension up to batch_size,
+        so batched predict calls run as one forward pass while single frames
+        still work.
+        
+        Args:
+            format: Export format ("engine" for TensorRT, "openvino", "onnx")
+            **kwargs: Extra Ultralytics export options (e.g. half=True, int8=True)
+            
+        Returns:
+            Path to the exported model
+        """
+        kwargs.setdefault("batch", self.batch_size)
+        kwargs.setdefault("dynamic", True)
+        target = self._artifact_path(format, int8=bool(kwargs.get("int8")))
+        
+        with _export_lock:
+            exported = str(YOLO(self.model_path).export(format=format, imgsz=self.imgsz, **kwargs))
+            
+            # Ultralytics names the output after the weights only; move it to a
+            # name that records the settings it was exported for
+            if os.path.abspath(exported) != os.path.abspath(target):
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.replace(exported, target)
+        
+        print(f"[YOLO] Exported model to {target}")
+        return target
     
-    def detect_vehicles(self, image_path: str) -> List[Dict[str, Any]]:
+    def detect_vehicles(self, image: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
         """
         Detect vehicles in the image.
         
         Args:
-            image_path: Path to image file
+            image: Path to image file, or an already decoded BGR frame
             
         Returns:
             List of detected vehicles with bounding boxes and metadata
         """
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image not found: {image_path}")
+        if isinstance(image, str):
+            if not os.path.exists(image):
+                raise FileNotFoundError(f"Image not found: {image}")
+            img, frame_size = self._read_frame_for_detection(image)
+            return self._boxes_to_vehicles(self._detect_vehicles_raw(img, frame_size))
+        
+        return self._detect_on_array(image)
+    
+    def _read_image(self, image_path: str) -> np.ndarray:
+        """Decode an image file (read-only, may be cached); ValueError if unreadable."""
+        try:
+            stat = os.stat(image_path)
+            img = _decode_image_file(image_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            img = None
+        if img is None:
+            raise ValueError(f"Could not load image from {image_path}")
+        return img
+    
+    def _read_frame_for_detection(self, image_path: str) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Decode an image file at the lowest resolution the detector can use.
+        
+        YOLO only sees the frame at imgsz, so a JPEG whose long side is at
+        least twice that is decoded at 1/2, 1/4 or 1/8 scale by libjpeg,
+        which skips most of the decode work. The reduced frame still has a
+        long side of at least imgsz.
+        
+        Args:
+            image_path: Path to image file
+            
+        Returns:
+            Tuple of (BGR frame, (width, height) of the full-resolution image).
+            Detections on the frame must be scaled up to that size
+        """
+        try:
+            stat = os.stat(image_path)
+            frame_size = _jpeg_frame_size(image_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            frame_size = None
+        if frame_size is None:
+            img = self._read_image(image_path)
+            return img, (img.shape[1], img.shape[0])
         
-        # Read image
-        img = cv2.imread(image_path)
+        reduce = 1
+        while reduce < 8 and max(frame_size) >= 2 * reduce * self.imgsz:
+            reduce *= 2
+        try:
+            img = _decode_image_file(image_path, stat.st_mtime_ns, stat.st_size, reduce)
+        except OSError:
+            img = None
         if img is None:
             raise ValueError(f"Could not load image from {image_path}")
+        return img, frame_size
+    
+    def _detect_on_array(self, img: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Run YOLO on a decoded frame.
+        
+        Args:
+            img: BGR frame
+            
+        Returns:
+            List of detected vehicles with bounding boxes and metadata
+        """
+        return self._boxes_to_vehicles(self._detect_vehicles_raw(img))
+    
+    def _detect_vehicles_raw(self, img: np.ndarray,
+                             frame_size: Optional[Tuple[int, int]] = None
+                             ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Run YOLO on a decoded frame and keep the detections as arrays.
+        
+        Args:
+            img: BGR frame
+            frame_size: (width, height) to report boxes in, when img was
+                decoded at reduced resolution (see _read_frame_for_detection)
+            
+        Returns:
+            Tuple of (boxes (N, 4) as x1, y1, x2, y2, confidences (N,), COCO class ids (N,))
+        """
+        # Run YOLO detection on a frame already shrunk to the inference size
+        small, scale = self._resize_for_inference(img, reuse_buffer=True, frame_size=frame_size)
+        results = self._predict(small)
+        
+        boxes = self._extract_boxes(results[0], scale)
+        
+        print(f"[YOLO] Detected {len(boxes[0])} vehicles in image")
+        return boxes
+    
+    def detect_vehicles_batch(
+        self,
+        images: List[Union[str, np.ndarray]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Detect vehicles in several frames, batching them through the model.
+        
+        Frames are sent to the model in groups of ``batch_size`` so the
+        per-call preprocessing and launch overhead is paid once per group
+        instead of once per frame.
+        
+        Args:
+            images: List of BGR frames or image file paths
+            
+        Returns:
+            List of detected vehicles for each frame, in input order
+        """
+        frames = [self._read_frame_for_detection(image) if isinstance(image, str)
+                  else (image, None) for image in images]
+        frame_images = [frame for frame, _ in frames]
+        frame_sizes = [frame_size for _, frame_size in frames]
+        
+        return [self._boxes_to_vehicles(boxes)
+                for boxes in self._detect_batch_raw(frame_images, frame_sizes)]
+    
+    def _detect_batch_raw(self, images: List[np.ndarray],
+                          frame_sizes: Optional[List[Optional[Tuple[int, int]]]] = None
+                          ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Batched detection returning array detections (see _detect_vehicles_raw) per frame."""
+        detections = []
+        if frame_sizes is None:
+            frame_sizes = [None] * len(images)
+        
+        for start in range(0, len(images), self.batch_size):
+            end = start + self.batch_size
+            resized = [self._resize_for_inference(img, frame_size=frame_size)
+                       for img, frame_size in zip(images[start:end], frame_sizes[start:end])]
+            results = self._predict([small for small, _ in resized])
+            for result, (_, scale) in zip(results, resized):
+                detections.append(self._extract_boxes(result, scale))
+        
+        print(f"[YOLO] Detected vehicles in {len(detections)} frames")
+        return detections
+    
+    def _predict(self, source):
+        """
+        Run the model on one frame or a list of frames with the detector settings.
+        
+        Only vehicle classes are kept, and NMS is class-agnostic so a vehicle
+        detected as both car and truck is reported once.
         
-        # Run YOLO detection
-        results = self.model.predict(
-            img,
+        Args:
+            source: BGR frame or list of BGR frames
+            
+        Returns:
+            List of Ultralytics results, one per frame
+        """
+        return self._executor.submit(
+            self.model.predict,
+            source,
             conf=self.conf_threshold,
             iou=self.iou_threshold,
+            imgsz=self.imgsz,
+            half=self.half,
+            classes=self._vehicle_classes,
+            agnostic_nms=True,
             verbose=False
-        )
-        
-        # Extract car bounding boxes (class 2 = car in COCO dataset)
-        vehicles = []
-        for box in results[0].boxes:
-            cls = int(box.cls[0])
-            if cls == 2:  # car class
-                x1, y1, x2, y2 = map(float, box.xyxy[0])
-                confidence = float(box.conf[0])
-                
-                vehicles.append({
-                    'bbox': [x1, y1, x2, y2],
-                    'confidence': confidence,
-                    'class': 'car'
-                })
+        ).result()
+    
+    def _resize_for_inference(self, img: np.ndarray, reuse_buffer: bool = False,
+                              frame_size: Optional[Tuple[int, int]] = None
+                              ) -> Tuple[np.ndarray, Union[float, np.ndarray]]:
+        """
+        Shrink a frame so its long side matches the inference size.
+        
+        YOLO letterboxes every input to imgsz anyway; resizing once here with
+        area interpolation means the full-resolution frame is not copied
+        through the model's preprocessing.
+        
+        Args:
+            img: BGR frame
+            reuse_buffer: Resize into a buffer kept per thread instead of a
+                new array. Only valid when the result is used before the next
+                call from the same thread (not for batches)
+            frame_size: (width, height) detections should be scaled back to,
+                if img is a reduced decode of a larger frame
+            
+        Returns:
+            Tuple of (resized frame, factor to scale detections back up; an
+            x1, y1, x2, y2 array when the x and y factors differ)
+        """
+        img_height, img_width = img.shape[:2]
+        long_side = max(img_height, img_width)
+        scale = max(1.0, long_side / self.imgsz)
+        size = (max(1, round(img_width / scale)), max(1, round(img_height / scale)))
+        
+        back = scale
+        if frame_size is not None and frame_size != (img_width, img_height):
+            # Reduced JPEG decodes round up odd sizes, so x and y differ slightly
+            sx, sy = frame_size[0] / img_width, frame_size[1] / img_height
+            back = scale * np.array([sx, sy, sx, sy])
+        
+        if long_side <= self.imgsz:
+            return img, back
+        if not reuse_buffer:
+            return cv2.resize(img, size, interpolation=cv2.INTER_AREA), back
+        
+        # Frames from one source keep the same size, so the buffer is
+        # allocated once and cv2.resize writes into it in place
+        buf = getattr(self._buffers, 'resize', None)
+        shape = (size[1], size[0]) + img.shape[2:]
+        if buf is None or buf.shape != shape or buf.dtype != img.dtype:
+            buf = np.empty(shape, dtype=img.dtype)
+            self._buffers.resize = buf
+        cv2.resize(img, size, dst=buf, interpolation=cv2.INTER_AREA)
+        return buf, back
+    
+    def _extract_boxes(self, result, scale: Union[float, np.ndarray] = 1.0
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Extract vehicle detections from a single YOLO result as arrays.
         
-        print(f"[YOLO] Detected {len(vehicles)} vehicles in image")
-        return vehicles
+        Args:
+            result: Ultralytics result for one frame
+            scale: Factor (or x1, y1, x2, y2 factors) mapping result
+                coordinates back to the original frame
+            
+        Returns:
+            Tuple of (boxes (N, 4) as x1, y1, x2, y2, confidences (N,), COCO class ids (N,))
+        """
+        # Pull all boxes off the device in one go and filter them with one
+        # array mask (the model is already restricted to vehicle classes,
+        # this guards models that ignore the classes option)
+        boxes = result.boxes
+        classes = boxes.cls.cpu().numpy().reshape(-1).astype(np.int32)
+        keep = np.isin(classes, self._vehicle_classes)
+        xyxy = boxes.xyxy.cpu().numpy().reshape(-1, 4)[keep].astype(np.float64) * scale
+        confs = boxes.conf.cpu().numpy().reshape(-1)[keep]
+        
+        return xyxy, confs, classes[keep]
+    
+    def _boxes_to_vehicles(self, boxes: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> List[Dict[str, Any]]:
+        """Convert array detections to the vehicle dicts returned by the public API."""
+        xyxy, confs, classes = boxes
+        return [
+            {'bbox': bbox, 'confidence': confidence, 'class': VEHICLE_CLASSES[cls]}
+            for bbox, confidence, cls in zip(xyxy.tolist(), confs.tolist(), classes.tolist())
+        ]
     
     def polygon_to_bbox(self, polygon: List[List[float]]) -> List[float]:
         """
@@ -105,10 +671,11 @@ class YOLODetector:
         Returns:
             Bounding box as [x_min, y_min, x_max, y_max]
         """
-        pts = np.array(polygon)
-        x_min, y_min = pts.min(axis=0)
-        x_max, y_max = pts.max(axis=0)
-        return [x_min, y_min, x_max, y_max]
+        pts = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if pts.shape[0] == 0:
+            # The compiled kernel does not bounds-check pts[0]
+            raise ValueError("Cannot compute the bounding box of an empty polygon")
+        return _poly_bbox(pts).tolist()
     
     def calculate_iou(self, box1: List[float], box2: List[float]) -> float:
         """
@@ -121,31 +688,87 @@ class YOLODetector:
         Returns:
             IoU value between 0 and 1
         """
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
+        return float(_iou(*map(float, box1), *map(float, box2)))
+    
+    def calculate_iou_matrix(self, boxes1, boxes2) -> np.ndarray:
+        """
+        Calculate IoU between every pair of boxes from two sets.
+        
+        Args:
+            boxes1: Array-like of shape (S, 4) as [x_min, y_min, x_max, y_max]
+            boxes2: Array-like of shape (C, 4) as [x_min, y_min, x_max, y_max]
+            
+        Returns:
+            IoU matrix of shape (S, C)
+        """
+        a = np.asarray(boxes1, dtype=np.float32).reshape(-1, 4)
+        b = np.asarray(boxes2, dtype=np.float32).reshape(-1, 4)
+        
+        # Box areas once per box, not per pair
+        area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+        area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
         
-        # Calculate intersection area
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
+        # Intersection rectangles for all pairs via broadcasting; the (S, C)
+        # temporaries are reused in place
+        iw = np.minimum(a[:, None, 2], b[None, :, 2])
+        iw -= np.maximum(a[:, None, 0], b[None, :, 0])
+        np.maximum(iw, 0, out=iw)
+        ih = np.minimum(a[:, None, 3], b[None, :, 3])
+        ih -= np.maximum(a[:, None, 1], b[None, :, 1])
+        np.maximum(ih, 0, out=ih)
+        inter = np.multiply(iw, ih, out=iw)
         
-        if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
-            return 0.0
+        union = np.add(area_a[:, None], area_b[None, :], out=ih)
+        union -= inter
         
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
+        return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+    
+    def _best_matches(self, slot_boxes: np.ndarray, vehicle_boxes: np.ndarray,
+                      frame_size: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the best matching vehicle for every slot.
         
-        # Calculate union area
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
+        Small problems go through the compiled loop (when numba is available),
+        where NumPy's per-call overhead would dominate; larger ones through
+        the broadcast IoU matrix.
         
-        return inter_area / union_area if union_area > 0 else 0.0
+        Args:
+            slot_boxes: (K, 4) float32 slot boxes
+            vehicle_boxes: (N, 4) float32 vehicle boxes, N >= 1
+            frame_size: (width, height) of the frame the vehicles were
+                detected in; enables the early exit in the compiled loop
+            
+        Returns:
+            Tuple of (best IoU per slot, index of the best vehicle per slot)
+        """
+        if NUMBA_AVAILABLE and len(slot_boxes) * len(vehicle_boxes) < NUMBA_MAX_PAIRS:
+            # Agnostic NMS leaves no two detections overlapping by more than
+            # iou_threshold. Since 1 - IoU is a metric, at most one of them can
+            # then have IoU above (1 + iou_threshold) / 2 with a slot, so once
+            # it is found the others can be skipped. Ultralytics clips boxes to
+            # the frame after NMS, which can push edge boxes past that bound,
+            # so boxes within one model-input pixel of the border are always
+            # checked and never end the scan
+            if frame_size is None:
+                clipped = np.ones(len(vehicle_boxes), dtype=np.bool_)
+            else:
+                width, height = frame_size
+                edge = max(1.0, max(width, height) / self.imgsz)
+                clipped = ((vehicle_boxes[:, 0] <= edge) | (vehicle_boxes[:, 1] <= edge)
+                           | (vehicle_boxes[:, 2] >= width - edge)
+                           | (vehicle_boxes[:, 3] >= height - edge))
+            stop_iou = max(0.9, (1.0 + self.iou_threshold) / 2)
+            return _best_iou(np.ascontiguousarray(slot_boxes),
+                             np.ascontiguousarray(vehicle_boxes), clipped, stop_iou)
+        
+        ious = self.calculate_iou_matrix(slot_boxes, vehicle_boxes)
+        return ious.max(axis=1), ious.argmax(axis=1)
     
     def check_slot_occupancy(
         self,
         slot_polygon: List[List[float]],
-        vehicle_boxes: List[Dict[str, Any]]
+        vehicle_boxes: List[Dict[str, Any]],
+        slot_bbox: Optional[List[float]] = None
     ) -> Tuple[bool, float, Optional[Dict[str, Any]]]:
         """
         Check if a parking slot is occupied by any detected vehicle.
@@ -153,152 +776,444 @@ class YOLODetector:
         Args:
             slot_polygon: Parking slot polygon coordinates
             vehicle_boxes: List of detected vehicle bounding boxes
+            slot_bbox: Precomputed bounding box of the slot polygon (optional)
             
         Returns:
             Tuple of (is_occupied, max_iou, matched_vehicle)
         """
-        slot_bbox = self.polygon_to_bbox(slot_polygon)
+        if not vehicle_boxes:
+            return False, 0.0, None
         
-        max_iou = 0.0
-        matched_vehicle = None
+        if slot_bbox is None:
+            slot_bbox = self.polygon_to_bbox(slot_polygon)
+        vehicle_bboxes = [vehicle['bbox'] for vehicle in vehicle_boxes]
         
-        for vehicle in vehicle_boxes:
-            iou = self.calculate_iou(slot_bbox, vehicle['bbox'])
-            if iou > max_iou:
-                max_iou = iou
-                matched_vehicle = vehicle
+        # IoU against every vehicle in one vectorized pass
+        ious = self.calculate_iou_matrix([slot_bbox], vehicle_bboxes)[0]
+        best = int(ious.argmax())
+        max_iou = float(ious[best])
+        matched_vehicle = vehicle_boxes[best] if max_iou > 0 else None
         
         is_occupied = max_iou >= self.occupied_threshold
         
         return is_occupied, max_iou, matched_vehicle
     
-    def detect_occupancy(
+    def _prepare_slots(
         self,
-        image_path: str,
-        slots: List[Dict[str, Any]]
+        slots: List[Dict[str, Any]],
+        img_width: int,
+        img_height: int
     ) -> List[Dict[str, Any]]:
         """
-        Detect occupancy for all parking slots using YOLO vehicle detection.
+        Convert slot definitions to pixel geometry.
+        
+        Pixel polygons, bounding boxes, drawing points, centroids and label
+        text/positions only depend on the slot definitions and image size, so
+        the last result is cached and reused while those stay the same (e.g.
+        repeated polling of the same lot).
         
         Args:
-            image_path: Path to parking lot image
-            slots: List of slot definitions with coordinates
+            slots: List of slot definitions with normalized coordinates
+            img_width: Width of the image the slots are applied to
+            img_height: Height of the image the slots are applied to
             
         Returns:
-            List of slot occupancy results with vehicle metadata
+            List of per-slot geometry dicts (slots without coordinates are skipped)
         """
-        print(f"[YOLO] Processing image: {image_path} with {len(slots)} slots")
+        cache_key = (img_width, img_height, json.dumps(slots, sort_keys=True, default=str))
+        cached = self._slot_cache
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
         
-        # Detect all vehicles in the image
-        vehicles = self.detect_vehicles(image_path)
+        slot_ids, slot_nums, polygons = self._normalize_slots(slots, img_width, img_height)
         
-        # Load image to get dimensions
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Could not load image from {image_path}")
+        # Bounding boxes for all slots at once, in float32 like the IoU matrix
+        # (rounding is monotonic, so min/max commute with the cast)
+        if polygons:
+            counts = [len(polygon) for polygon in polygons]
+            starts = np.cumsum([0] + counts[:-1])
+            vertices = np.concatenate(polygons)
+            vertices32 = vertices.astype(np.float32)
+            bboxes = np.concatenate([np.minimum.reduceat(vertices32, starts),
+                                     np.maximum.reduceat(vertices32, starts)], axis=1)
+            # Vertex mean as the label anchor; unlike the area centroid it is
+            # defined for degenerate polygons too
+            centroids = (np.add.reduceat(vertices, starts) / np.array(counts)[:, None]).astype(int)
+        else:
+            bboxes = np.zeros((0, 4), dtype=np.float32)
+            centroids = np.zeros((0, 2), dtype=int)
         
-        img_height, img_width = img.shape[:2]
+        geometry = []
         
-        results = []
+        for slot_id, slot_num, polygon, bbox, (cx, cy) in zip(
+                slot_ids, slot_nums, polygons, bboxes.tolist(), centroids.tolist()):
+            geometry.append({
+                'slot_id': slot_id,
+                'slot_number': slot_num,
+                'pixel_coords': polygon.tolist(),
+                'bbox': bbox,
+                'pts': polygon.astype(np.int32).reshape((-1, 1, 2)),
+                'centroid': (cx, cy),
+                'label': f"#{slot_num}",
+                'label_org': (cx - 10, cy)
+            })
+        
+        self._slot_cache = (cache_key, geometry, bboxes)
+        return geometry
+    
+    def _normalize_slots(
+        self,
+        slots: List[Dict[str, Any]],
+        img_width: int,
+        img_height: int
+    ) -> Tuple[List[Any], List[Any], List[np.ndarray]]:
+        """
+        Convert normalized slot coordinates to pixel polygons.
+        
+        Coordinates of all slots are gathered into one array and scaled by
+        their slot's image size in a single vectorized multiply.
+        
+        Args:
+            slots: List of slot definitions with normalized coordinates
+            img_width: Width of the image the slots are applied to
+            img_height: Height of the image the slots are applied to
+            
+        Returns:
+            Tuple of (slot ids, slot numbers, (V, 2) float64 pixel polygons)
+            for the slots that have valid coordinates
+        """
+        slot_ids, slot_nums, points, sizes = [], [], [], []
         
         for slot in slots:
+            coordinates = slot.get('coordinates', [])
+            slot_id = slot.get('slot_id') or slot.get('slotId')
+            slot_num = slot.get('slot_number') or slot.get('slotNumber')
+            
+            # Get image dimensions (use slot's stored dims or actual image dims)
+            s_width = slot.get('image_width') or slot.get('imageWidth') or img_width
+            s_height = slot.get('image_height') or slot.get('imageHeight') or img_height
+            
+            if not coordinates:
+                print(f"[YOLO] Warning: Slot {slot_num} has no coordinates")
+                continue
+            
             try:
-                # Extract slot information
-                coordinates = slot.get('coordinates', [])
-                slot_id = slot.get('slot_id') or slot.get('slotId')
-                slot_num = slot.get('slot_number') or slot.get('slotNumber')
-                
-                # Get image dimensions (use slot's stored dims or actual image dims)
-                s_width = slot.get('image_width') or slot.get('imageWidth') or img_width
-                s_height = slot.get('image_height') or slot.get('imageHeight') or img_height
-                
-                if not coordinates:
-                    print(f"[YOLO] Warning: Slot {slot_num} has no coordinates")
-                    continue
-                
-                # Convert normalized coordinates to pixel coordinates
-                pixel_coords = []
+                normalized = []
                 for coord in coordinates:
                     if isinstance(coord, dict):
-                        x_norm = coord.get('x', 0)
-                        y_norm = coord.get('y', 0)
+                        normalized.append((coord.get('x', 0), coord.get('y', 0)))
                     elif isinstance(coord, (list, tuple)):
-                        x_norm = coord[0]
-                        y_norm = coord[1]
-                    else:
-                        continue
-                    
-                    pixel_coords.append([
-                        float(x_norm * s_width),
-                        float(y_norm * s_height)
-                    ])
-                
-                # Check slot occupancy
-                is_occupied, max_iou, matched_vehicle = self.check_slot_occupancy(
-                    pixel_coords,
-                    vehicles
-                )
-                
-                status = 'occupied' if is_occupied else 'vacant'
+                        normalized.append((coord[0], coord[1]))
                 
-                # Prepare result
-                result = {
-                    'slot_id': slot_id,
-                    'slot_number': slot_num,
-                    'status': status,
-                    'confidence': 1.0,
-                    'occupancy_ratio': max_iou,
-                    'detection_method': 'yolo'
-                }
-                
-                # Add vehicle metadata if occupied
-                if is_occupied and matched_vehicle:
-                    result['vehicle_metadata'] = {
-                        'bounding_box': {
-                            'x1': matched_vehicle['bbox'][0],
-                            'y1': matched_vehicle['bbox'][1],
-                            'x2': matched_vehicle['bbox'][2],
-                            'y2': matched_vehicle['bbox'][3]
-                        },
-                        'confidence': matched_vehicle['confidence'],
-                        'iou': max_iou
-                    }
-                
-                print(f"[YOLO] Slot {slot_num}: Status={status}, IoU={max_iou:.3f}, "
-                      f"Vehicle={'Yes' if matched_vehicle else 'No'}")
-                
-                results.append(result)
+                if not normalized:
+                    print(f"[YOLO] Warning: Slot {slot_num} has no valid coordinates")
+                    continue
                 
+                normalized = np.array(normalized, dtype=np.float64)
+                size = (float(s_width), float(s_height))
             except Exception as e:
                 print(f"[YOLO] Error processing slot {slot_num}: {e}")
                 continue
+            
+            slot_ids.append(slot_id)
+            slot_nums.append(slot_num)
+            points.append(normalized)
+            sizes.append(size)
+        
+        if not points:
+            return slot_ids, slot_nums, []
+        
+        # Scale every vertex by its slot's image size in one pass
+        counts = [len(p) for p in points]
+        scale = np.repeat(np.array(sizes, dtype=np.float64), counts, axis=0)
+        pixels = np.concatenate(points) * scale
+        
+        return slot_ids, slot_nums, np.split(pixels, np.cumsum(counts)[:-1])
+    
+    def _slot_bboxes(self, geometry: List[Dict[str, Any]]) -> np.ndarray:
+        """Slot bounding boxes as a (K, 4) float32 array, reusing the cached one."""
+        cached = self._slot_cache
+        if cached is not None and cached[1] is geometry:
+            return cached[2]
+        return np.array([geom['bbox'] for geom in geometry], dtype=np.float32).reshape(-1, 4)
+    
+    def _scene_unchanged(self, gray: np.ndarray, geometry: List[Dict[str, Any]]) -> bool:
+        """
+        Check whether the slot areas look the same as at the last YOLO run.
+        
+        Compares a 4x downsampled grayscale frame against the reference frame
+        kept from the last detection, slot by slot, and runs YOLO again as
+        soon as any single slot changed by motion_threshold or more (so one
+        car arriving in a large lot is not averaged away). Comparing against
+        the reference (not the previous call) means slow changes still add up
+        and trigger a new detection.
+        
+        Must be called with _state_lock held.
+        
+        Args:
+            gray: Current frame from _motion_gray
+            geometry: Slot geometry from _prepare_slots
+            
+        Returns:
+            True if the previous vehicle detections can be reused
+        """
+        if self.motion_threshold <= 0 or not geometry:
+            return False
+        
+        if (self._ref_gray is None or self._ref_geometry is not geometry
+                or self._ref_gray.shape != gray.shape
+                or self._calls_since_detect + 1 >= self.motion_refresh_interval):
+            return False
+        
+        if self._motion_regions is None:
+            self._motion_regions = self._slot_motion_regions(geometry, gray.shape)
+        if not self._motion_regions:
+            return False
+        
+        diff = cv2.absdiff(gray, self._ref_gray)
+        _, changed = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+        
+        for x0, y0, x1, y1, mask, area in self._motion_regions:
+            changed_pixels = cv2.countNonZero(cv2.bitwise_and(changed[y0:y1, x0:x1], mask))
+            if changed_pixels / area >= self.motion_threshold:
+                return False
+        return True
+    
+    def _slot_motion_regions(self, geometry: List[Dict[str, Any]],
+                             shape: Tuple[int, ...]) -> List[Tuple[int, int, int, int, np.ndarray, int]]:
+        """
+        Crop rects and polygon masks of the slots in the 4x downsampled frame.
+        
+        Args:
+            geometry: Slot geometry from _prepare_slots
+            shape: Shape of the downsampled grayscale frame
+            
+        Returns:
+            List of (x0, y0, x1, y1, mask, mask pixel count) per slot that has
+            pixels inside the frame
+        """
+        height, width = shape[:2]
+        regions = []
+        for geom in geometry:
+            pts = geom['pts'] // 4
+            x, y, w, h = cv2.boundingRect(pts)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, width), min(y + h, height)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.fillPoly(mask, [pts - [x0, y0]], 255)
+            area = cv2.countNonZero(mask)
+            if area:
+                regions.append((x0, y0, x1, y1, mask, area))
+        return regions
+    
+    def _motion_gray(self, img: np.ndarray,
+                     frame_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Grayscale frame at 1/4 of the full resolution, matching the slot mask."""
+        if frame_size is None:
+            frame_size = (img.shape[1], img.shape[0])
+        small = cv2.resize(img, (max(1, frame_size[0] // 4), max(1, frame_size[1] // 4)),
+                           interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    
+    def _update_motion_reference(self, gray: np.ndarray, geometry: List[Dict[str, Any]],
+                                 boxes: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        """Store the frame and detections of a YOLO run for motion gating (under _state_lock)."""
+        if self._ref_geometry is not geometry:
+            self._motion_regions = None
+        self._ref_gray = gray
+        self._ref_geometry = geometry
+        self._last_boxes = boxes
+        self._calls_since_detect = 0
+    
+    def detect_occupancy(
+        self,
+        image_path: str,
+        slots: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Detect occupancy for all parking slots using YOLO vehicle detection.
+        
+        Args:
+            image_path: Path to parking lot image
+            slots: List of slot definitions with coordinates
+            
+        Returns:
+            List of slot occupancy results with vehicle metadata
+        """
+        print(f"[YOLO] Processing image: {image_path} with {len(slots)} slots")
+        
+        # Decode once (at reduced resolution for large JPEGs); the same frame
+        # is used for motion gating and detection. Slot geometry and boxes
+        # stay in full-resolution coordinates
+        img, frame_size = self._read_frame_for_detection(image_path)
+        
+        img_width, img_height = frame_size
+        geometry = self._prepare_slots(slots, img_width, img_height)
+        
+        # Detect all vehicles in the image, unless nothing moved in the slots.
+        # The check and the reuse of the stored boxes happen under one lock
+        # so a concurrent call for another lot cannot swap them in between
+        gray = self._motion_gray(img, frame_size) if self.motion_threshold > 0 else None
+        with self._state_lock:
+            reuse = gray is not None and self._scene_unchanged(gray, geometry)
+            if reuse:
+                boxes = self._last_boxes
+                self._calls_since_detect += 1
+        
+        if reuse:
+            print(f"[YOLO] No motion in slot areas, reusing {len(boxes[0])} detected vehicles")
+        else:
+            boxes = self._detect_vehicles_raw(img, frame_size)
+            if gray is not None:
+                with self._state_lock:
+                    self._update_motion_reference(gray, geometry, boxes)
+        
+        self._last_detection = (img, boxes)
+        return self._match_slots(geometry, boxes, frame_size)
+    
+    def detect_occupancy_batch(
+        self,
+        image_paths: List[str],
+        slots_list: List[List[Dict[str, Any]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Detect occupancy for several parking lot images with one batched YOLO pass.
+        
+        Motion gating is not applied here, since consecutive entries usually
+        come from different cameras.
+        
+        Args:
+            image_paths: Paths to parking lot images
+            slots_list: Slot definitions for each image, in the same order
+            
+        Returns:
+            List of slot occupancy results for each image, in input order
+        """
+        print(f"[YOLO] Processing batch of {len(image_paths)} images")
+        
+        frames = [self._read_frame_for_detection(image_path) for image_path in image_paths]
+        images = [img for img, _ in frames]
+        frame_sizes = [frame_size for _, frame_size in frames]
+        
+        detections = self._detect_batch_raw(images, frame_sizes)
+        
+        results = []
+        for (img_width, img_height), slots, boxes in zip(frame_sizes, slots_list, detections):
+            geometry = self._prepare_slots(slots, img_width, img_height)
+            results.append(self._match_slots(geometry, boxes, (img_width, img_height)))
+        return results
+    
+    def _match_slots(
+        self,
+        geometry: List[Dict[str, Any]],
+        boxes: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        frame_size: Optional[Tuple[int, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build slot occupancy results by matching slots to detected vehicles.
+        
+        Args:
+            geometry: Slot geometry from _prepare_slots
+            boxes: Array detections for the same image (see _detect_vehicles_raw)
+            frame_size: (width, height) of that image
+            
+        Returns:
+            List of slot occupancy results with vehicle metadata
+        """
+        xyxy, confs, _ = boxes
+        best_iou = [0.0] * len(geometry)
+        best_vehicle = [0] * len(geometry)
+        
+        if geometry and len(xyxy):
+            slot_boxes = self._slot_bboxes(geometry)
+            vehicle_boxes = xyxy.astype(np.float32)
+            
+            # Drop vehicles outside the box around all slots (street traffic,
+            # neighbouring lots); they can't overlap any slot
+            roi_min = slot_boxes[:, :2].min(axis=0)
+            roi_max = slot_boxes[:, 2:].max(axis=0)
+            candidates = np.flatnonzero(
+                (vehicle_boxes[:, 2] > roi_min[0]) & (vehicle_boxes[:, 0] < roi_max[0])
+                & (vehicle_boxes[:, 3] > roi_min[1]) & (vehicle_boxes[:, 1] < roi_max[1])
+            )
+            
+            # Best IoU of every slot against the remaining vehicles
+            if candidates.size:
+                slot_best_iou, slot_best_idx = self._best_matches(slot_boxes, vehicle_boxes[candidates],
+                                                                  frame_size)
+                best_vehicle = candidates[slot_best_idx].tolist()
+                best_iou = slot_best_iou.tolist()
+        
+        occupied = (np.asarray(best_iou) >= self.occupied_threshold).tolist()
+        
+        # Per-slot results live in the parallel lists above; they are only
+        # turned into response dicts here
+        results = []
+        for geom, max_iou, vehicle_idx, is_occupied in zip(geometry, best_iou, best_vehicle, occupied):
+            result = {
+                'slot_id': geom['slot_id'],
+                'slot_number': geom['slot_number'],
+                'status': 'occupied' if is_occupied else 'vacant',
+                'confidence': 1.0,
+                'occupancy_ratio': max_iou,
+                'detection_method': 'yolo'
+            }
+            
+            # Add vehicle metadata if occupied
+            if is_occupied and max_iou > 0:
+                x1, y1, x2, y2 = xyxy[vehicle_idx].tolist()
+                result['vehicle_metadata'] = {
+                    'bounding_box': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+                    'confidence': confs[vehicle_idx].item(),
+                    'iou': max_iou
+                }
+            
+            results.append(result)
+        
+        print(f"[YOLO] {sum(occupied)}/{len(results)} slots occupied "
+              f"({len(xyxy)} vehicles detected)")
         
         return results
     
     def visualize_detection(
         self,
-        image_path: str,
+        image: Union[str, np.ndarray],
         slots: List[Dict[str, Any]],
         results: List[Dict[str, Any]],
-        output_path: str
+        output_path: str,
+        vehicles: Optional[List[Dict[str, Any]]] = None
     ):
         """
         Create visualization of detection results.
         
         Args:
-            image_path: Path to original image
+            image: Path to original image, or the already decoded BGR frame
+                (it is not modified)
             slots: List of slot definitions
             results: Detection results
             output_path: Path to save visualization
+            vehicles: Vehicles detected in this image. If omitted, the ones from
+                the preceding detect_occupancy call on the same frame are
+                reused, and YOLO only runs again for a different frame
         """
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Could not load image from {image_path}")
+        frame = image
+        if isinstance(image, str):
+            image = self._read_image(frame)
         
-        img_height, img_width = img.shape[:2]
+        if vehicles is None:
+            # Decoded frames are cached, so the same unchanged file gives the
+            # same array that detect_occupancy just ran on
+            if isinstance(frame, str):
+                frame = self._read_frame_for_detection(frame)[0]
+            if self._last_detection is not None and self._last_detection[0] is frame:
+                vehicles = self._boxes_to_vehicles(self._last_detection[1])
+            else:
+                vehicles = self._detect_on_array(image)
         
-        # Detect vehicles for visualization
-        vehicles = self.detect_vehicles(image_path)
+        img = image.copy()
+        img_height, img_width = img.shape[:2]
         
         # Draw vehicle bounding boxes
         for vehicle in vehicles:
@@ -308,62 +1223,123 @@ class YOLODetector:
             cv2.putText(img, conf_text, (x1, y1 - 5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 2)
         
-        # Draw parking slots
-        result_map = {r['slot_number']: r for r in results}
+        # Draw parking slots, one polylines call per color
+        geometry = self._prepare_slots(slots, img_width, img_height)
+        occupied_slots = {r['slot_number'] for r in results if r.get('status') == 'occupied'}
+        occupied_pts = [geom['pts'] for geom in geometry if geom['slot_number'] in occupied_slots]
+        vacant_pts = [geom['pts'] for geom in geometry if geom['slot_number'] not in occupied_slots]
         
-        for slot in slots:
-            slot_num = slot.get('slot_number') or slot.get('slotNumber')
-            coordinates = slot.get('coordinates', [])
-            
-            if not coordinates:
-                continue
-            
-            # Convert to pixel coordinates
-            s_width = slot.get('image_width') or slot.get('imageWidth') or img_width
-            s_height = slot.get('image_height') or slot.get('imageHeight') or img_height
-            
-            pixel_coords = []
-            for coord in coordinates:
-                if isinstance(coord, dict):
-                    x_norm = coord.get('x', 0)
-                    y_norm = coord.get('y', 0)
-                elif isinstance(coord, (list, tuple)):
-                    x_norm = coord[0]
-                    y_norm = coord[1]
-                else:
-                    continue
-                
-                pixel_coords.append([
-                    int(x_norm * s_width),
-                    int(y_norm * s_height)
-                ])
-            
-            pts = np.array(pixel_coords, np.int32).reshape((-1, 1, 2))
-            
-            # Color based on occupancy
-            result = result_map.get(slot_num, {})
-            is_occupied = result.get('status') == 'occupied'
-            color = (0, 0, 255) if is_occupied else (0, 255, 0)  # Red/Green
-            
-            # Draw polygon
-            cv2.polylines(img, [pts], True, color, 2)
-            
-            # Add slot number
-            M = cv2.moments(pts)
-            if M["m00"] != 0:
-                cx = int(M["m10"] / M["m00"])
-                cy = int(M["m01"] / M["m00"])
-                cv2.putText(img, f"#{slot_num}", (cx - 10, cy),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        if occupied_pts:
+            cv2.polylines(img, occupied_pts, True, (0, 0, 255), 2)  # Red
+        if vacant_pts:
+            cv2.polylines(img, vacant_pts, True, (0, 255, 0), 2)  # Green
+        
+        # Add slot numbers on top of all outlines
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        for geom in geometry:
+            cv2.putText(img, geom['label'], geom['label_org'], font, 0.6, (255, 255, 255), 2)
         
         # Save visualization
         cv2.imwrite(output_path, img)
         print(f"[YOLO] Saved visualization to {output_path}")
 
 
+class OccupancyBatcher:
+    """
+    Coalesces concurrent occupancy requests into batched YOLO calls.
+    
+    Requests submitted from several threads (e.g. one Flask request per
+    camera) are collected for a short window and run through the model in
+    one predict call. A single worker thread owns the detector, so calls
+    never overlap on the model.
+    """
+    
+    def __init__(self, detector: YOLODetector, max_batch: int = 16, window: float = 0.02):
+        """
+        Start the batching worker.
+        
+        Args:
+            detector: Detector that runs the batches
+            max_batch: Maximum number of requests per predict call
+            window: Seconds to wait for more requests after the first arrives
+        """
+        self.detector = detector
+        self.max_batch = max(1, int(max_batch))
+        self.window = window
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def submit(self, image_path: str, slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Detect occupancy for one image, batched with concurrent requests.
+        
+        Args:
+            image_path: Path to parking lot image
+            slots: List of slot definitions with coordinates
+            
+        Returns:
+            List of slot occupancy results, as from YOLODetector.detect_occupancy
+        """
+        future = Future()
+        self._requests.put((image_path, slots, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            if len(batch) > 1:
+                try:
+                    results = self.detector.detect_occupancy_batch(
+                        [image_path for image_path, _, _ in batch],
+                        [slots for _, slots, _ in batch]
+                    )
+                    for (_, _, future), result in zip(batch, results):
+                        future.set_result(result)
+                    continue
+                except Exception as e:
+                    # Retry one by one so a bad image only fails its own request
+                    print(f"[YOLO] Batch of {len(batch)} failed, retrying individually: {e}")
+            
+            # A lone request keeps the single-image path and its motion gating
+            for image_path, slots, future in batch:
+                try:
+                    future.set_result(self.detector.detect_occupancy(image_path, slots))
+                except Exception as e:
+                    future.set_exception(e)
+
+
 if __name__ == "__main__":
-    # Test the detector
-    print("Testing YOLO Detector...")
+    import argparse
     
-    detector = YOLODetector()
-    print("✅ YOLO Detector initialized successfully")
+    parser = argparse.ArgumentParser(description="YOLO vehicle detector")
+    parser.add_argument("--export", choices=["engine", "openvino", "onnx"],
+                        help="Export the model to an optimized runtime and exit")
+    parser.add_argument("--int8", action="store_true",
+                        help="Quantize to INT8 on export (needs --data, see calib.py)")
+    parser.add_argument("--data", help="Calibration dataset YAML for INT8 export")
+    args = parser.parse_args()
+    
+    if args.export:
+        detector = YOLODetector(auto_export=False)
+        options = {"half": args.export == "engine" and not args.int8}
+        if args.int8:
+            options.update(int8=True, data=args.data)
+        path = detector.export_model(args.export, **options)
+        print(f"✅ Exported model to {path}")
+    else:
+        # Test the detector
+        print("Testing YOLO Detector...")
+        
+        detector = YOLODetector()
+        print("✅ YOLO Detector initialized successfully")